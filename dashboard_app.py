@@ -1,6 +1,12 @@
+import glob
+import hashlib
+import math
+import os
+import re
 import pandas as pd
 import streamlit as st
-import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
 from streamlit_plotly_events import plotly_events # New library for better event handling
 import numpy as np # Added for robust data type handling
 
@@ -11,6 +17,22 @@ import numpy as np # Added for robust data type handling
 # Please rename your Excel file to 'sales_data.xlsx' and place it in the same directory.
 FILE_PATH = './sales_data.xlsx' # <<<--- CORRECT RELATIVE PATH FOR CLOUD DEPLOYMENT
 SHEET_NAME = 'Sh1' # Check spelling and capitalization of this sheet name in Excel
+CACHE_DIR = './.cache' # On-disk Parquet cache of the parsed worksheet (survives app restarts)
+FILTER_COLUMNS = ('Region', 'Category', 'Supplier', 'Item', 'Month') # Columns exposed as sidebar filters
+# Every column the dashboard reads; anything else in the worksheet is dropped at load time
+USED_COLUMNS = ('Region', 'Category', 'Supplier', 'Item', 'Month', 'Sales Total', 'Margin', 'Sales Price', 'Sales Qty', 'Net_Revenue')
+FIGURE_CACHE_MAX_ENTRIES = 64 # Cached figures kept per chart builder (one per distinct filter state)
+PREVIEW_PAGE_SIZE = 500 # Rows sent to the browser per page of the raw data preview
+LINE_CANVAS_WIDTH = 1200 # Approximate plot width in pixels used for M4 aggregation of the trend line
+LINE_MAX_POINTS = 1000 # The trend line is downsampled (LTTB) to at most this many points
+# Reducers offered for bucketing the trend line down to LINE_MAX_POINTS ('NONE' uses M4/LTTB instead)
+TREND_AGGREGATORS = {
+    'AVG': 'mean',
+    'MIN': 'min',
+    'MAX': 'max',
+    'P95': lambda x: x.quantile(0.95),
+}
+LINE_LABEL_MAX_POINTS = 30 # Per-point value labels are only drawn on the trend line below this many points
 
 # --- SESSION STATE INITIALIZATION ---
 # Initialize session state variables to hold chart click selections
@@ -18,20 +40,88 @@ if 'region_click_filter' not in st.session_state:
     st.session_state.region_click_filter = []
 if 'category_click_filter' not in st.session_state:
     st.session_state.category_click_filter = []
+# Appended to the pie charts' component keys: bumping it remounts both charts, which drops their last
+# click so a click that has already been applied isn't returned again on the next rerun
+if 'chart_click_nonce' not in st.session_state:
+    st.session_state.chart_click_nonce = 0
 # --- END SESSION STATE ---
 
-# Use Streamlit's cache decorator to load the data efficiently (only loads once)
+def _parquet_cache_path(file_path, sheet_name):
+    """Returns the Parquet cache file for the worksheet, named '<source>-<version>.parquet'.
+
+    <source> hashes the workbook's path and sheet name; <version> hashes its mtime and SHA-1.
+    """
+    source = hashlib.sha1(f"{os.path.abspath(file_path)}|{sheet_name}".encode()).hexdigest()
+    with open(file_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    mtime = os.path.getmtime(file_path)
+    version = hashlib.sha1(f"{mtime}|{digest}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{source}-{version}.parquet")
+
+def read_worksheet(file_path, sheet_name):
+    """Reads the worksheet, skipping Excel parsing when an up-to-date Parquet copy exists on disk."""
+    cache_path = _parquet_cache_path(file_path, sheet_name)
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_parquet(cache_path)
+        except Exception:
+            pass # Unreadable cache entry: fall back to parsing the workbook
+
+    # Load data, assuming default types (calamine is a much faster xlsx parser than openpyxl)
+    try:
+        df = pd.read_excel(file_path, sheet_name=sheet_name, engine='calamine')
+    except ValueError as e:
+        # calamine reports a missing worksheet as ValueError("Worksheet named '...' not found");
+        # surface it as a KeyError so load_data can tell it apart from any other ValueError
+        if re.search(r"Worksheet named .* not found", str(e)):
+            raise KeyError(sheet_name) from e
+        raise
+
+    # Caching is best-effort: write to a temp file and rename so concurrent workers never see a partial file
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, compression='zstd')
+        os.replace(tmp_path, cache_path)
+
+        # Remove older versions of this worksheet's cache so edits to the workbook don't grow the directory
+        source = os.path.basename(cache_path).split('-')[0]
+        for stale_path in glob.glob(os.path.join(CACHE_DIR, f"{source}-*.parquet")):
+            if stale_path != cache_path:
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass # Already removed by another worker
+    except Exception:
+        pass
+    return df
+
+# Use Streamlit's cache decorator to load the data efficiently (only loads once per process;
+# the Parquet cache above covers fresh processes)
 @st.cache_data
 def load_data(file_path, sheet_name):
     """Loads data from the Excel file into a pandas DataFrame."""
     try:
-        # Load data, assuming default types
-        df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
+        df = read_worksheet(file_path, sheet_name)
+        df = df.drop(columns=[c for c in df.columns if c not in USED_COLUMNS])
         
         # --- Data Cleaning/Preprocessing Recommendation ---
         # Ensure Month is treated as a string or datetime for proper charting order
         if 'Month' in df.columns:
              df['Month'] = df['Month'].astype(str)
+
+        # Store the low-cardinality filter columns as categoricals so unique/isin/groupby work on integer codes
+        for column in FILTER_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype('category')
+
+        # Downcast the measures (float64 -> float32, int64 -> smallest int) to cut the bytes every scan reads.
+        # KPI totals are still accumulated in float64.
+        for column in ('Sales Total', 'Margin', 'Sales Price', 'Net_Revenue'):
+            if column in df.columns and pd.api.types.is_numeric_dtype(df[column]):
+                df[column] = pd.to_numeric(df[column], downcast='float')
+        if 'Sales Qty' in df.columns and pd.api.types.is_numeric_dtype(df['Sales Qty']):
+            df['Sales Qty'] = pd.to_numeric(df['Sales Qty'], downcast='integer')
         # --------------------------------------------------
         
         return df
@@ -48,7 +138,7 @@ def load_data(file_path, sheet_name):
     except KeyError:
         # --- IMPROVED ERROR HANDLING FOR SHEET NAME ---
         try:
-            xlsx = pd.ExcelFile(file_path, engine='openpyxl')
+            xlsx = pd.ExcelFile(file_path, engine='calamine')
             available_sheets = ", ".join([f"**'{s}'" for s in xlsx.sheet_names])
             st.error(
                 f"🚨 **Sheet Not Found Error**:\n\n"
@@ -64,12 +154,248 @@ def load_data(file_path, sheet_name):
         st.error(f"An unexpected error occurred while loading data: {e}")
         return pd.DataFrame()
 
+@st.cache_data
+def get_unique_values(df):
+    """Returns the unique values of every filter column, computed once instead of on every rerun."""
+    return {c: df[c].unique().tolist() for c in FILTER_COLUMNS if c in df.columns}
+
+# The contribution charts always show the unfiltered distribution, so their groupbys only need computing once
+@st.cache_data
+def get_region_sales(df):
+    """Returns total Sales per Region over the full dataset."""
+    return df.groupby('Region', observed=True, sort=False)['Sales Total'].sum().reset_index()
+
+@st.cache_data
+def get_category_margin(df):
+    """Returns total Margin per Category over the full dataset."""
+    return df.groupby('Category', observed=True, sort=False)['Margin'].sum().reset_index()
+
+def sum_by_codes(df, key, values):
+    """Sums the `values` columns per category of the categorical `key` column.
+
+    Equivalent to df.groupby(key, observed=True)[values].sum().reset_index(), but computed with np.bincount
+    over the integer category codes: one vectorised pass per column, with no hashing or sorting.
+    Groups come back in category order (i.e. sorted). Pass every measure needed for `key` in one call.
+    """
+    codes = df[key].cat.codes.to_numpy()
+    # -1 marks a missing key, which groupby drops as well; only mask when there is one
+    present = None if len(codes) == 0 or codes.min() >= 0 else codes >= 0
+    if present is not None:
+        codes = codes[present]
+    categories = df[key].cat.categories
+    result = {key: categories}
+    for column in values:
+        weights = df[column].to_numpy(dtype=np.float64)
+        if present is not None:
+            weights = weights[present]
+        # np.bincount needs float64 weights anyway, so the NaN -> 0 fill can reuse that buffer
+        # (unless to_numpy returned a read-only view of an existing float64 column)
+        weights = np.nan_to_num(weights, copy=not weights.flags.writeable)
+        result[column] = np.bincount(codes, weights=weights, minlength=len(categories))
+    observed = np.bincount(codes, minlength=len(categories)) > 0
+    return pd.DataFrame(result)[observed].reset_index(drop=True)
+
+def top_k_positions(values, k):
+    """Returns the positions of the k largest values, largest first.
+
+    np.argpartition selects the top k in O(N); only those k are then sorted, instead of sorting everything.
+    """
+    values = np.asarray(values)
+    k = min(k, len(values))
+    if k == 0:
+        return np.arange(0)
+    top = np.argpartition(-values, k - 1)[:k]
+    return top[np.argsort(-values[top], kind='stable')]
+
+def lttb_indices(y, threshold):
+    """Returns the positions of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The series is treated as evenly spaced (x = position). The first and last points are always kept;
+    every bucket in between keeps the point forming the largest triangle with the previously kept point
+    and the average of the next bucket, which preserves the visual shape of the line.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    # threshold - 2 buckets spanning the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def m4_indices(y, width):
+    """Returns the positions of the points kept by M4 aggregation over `width` pixel columns.
+
+    Each pixel column keeps its first, last, minimum and maximum point, which renders a line visually
+    identical to the full series with at most 4 * width points. All four picks come from one groupby.
+    """
+    n = len(y)
+    if n <= 4 * width:
+        return np.arange(n)
+    frame = pd.DataFrame({'y': np.asarray(y, dtype=np.float64), 'bucket': (np.arange(n) * width) // n})
+    picks = frame.reset_index().groupby('bucket', sort=False).agg(
+        first=('index', 'first'), last=('index', 'last'), low=('y', 'idxmin'), high=('y', 'idxmax')
+    )
+    return np.unique(picks.to_numpy().ravel())
+
+# --- Chart figure builders ---
+# Each builder is cached on the (already aggregated) data it plots and returns the figure as a plain dict,
+# so reruns with an unchanged filter state skip figure construction entirely. The dicts are passed straight
+# to st.plotly_chart; the caches are bounded since every distinct filter state adds an entry.
+# Figures are built with graph_objects directly: the data is already aggregated, so plotly.express'
+# internal data wrangling (an extra groupby per figure) is pure overhead.
+
+@st.cache_data(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_trend_fig(sales_trend):
+    """Builds the Monthly Sales Total line chart."""
+    # Scattergl renders with WebGL instead of SVG, so long series don't stall the browser
+    fig_line = go.Figure(go.Scattergl(
+        x=sales_trend['Month'],
+        y=sales_trend['Sales Total'],
+        mode='lines+markers'
+    ))
+    fig_line.update_layout(
+        title='Monthly Sales Total Trend',
+        xaxis_title='Month',
+        yaxis_title='Sales Total',
+        template='seaborn'
+    )
+    # Value labels only stay readable (and cheap to render) on short series
+    if len(sales_trend) < LINE_LABEL_MAX_POINTS:
+        fig_line.update_traces(
+            mode='lines+markers+text',
+            text=sales_trend['Sales Total'].round(0),
+            texttemplate='₹%{text:,.0f}',
+            textposition='top center'
+        )
+    return fig_line.to_dict()
+
+@st.cache_data(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_revenue_fig(revenue_data, revenue_col):
+    """Builds the monthly revenue bar chart for `revenue_col`."""
+    my_new_chart_figure = go.Figure(go.Bar(
+        x=revenue_data['Month'],
+        y=revenue_data[revenue_col],
+        marker_color='#1f77b4' # Sets a professional blue color
+    ))
+    my_new_chart_figure.update_layout(
+        title=f'{revenue_col} by Month',
+        # Optional: Customize look for professionalism
+        xaxis_title='Month',
+        yaxis_title='Amount ($)',
+        template='seaborn'
+    )
+    my_new_chart_figure.update_traces(textposition='outside')
+    return my_new_chart_figure.to_dict()
+
+@st.cache_data(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_category_sales_fig(sales_by_category):
+    """Builds the Sales Total by Product Category bar chart."""
+    # One colour per category, taken from the template's palette
+    colorway = pio.templates['seaborn'].layout.colorway
+    fig_bar = go.Figure(go.Bar(
+        x=sales_by_category['Category'],
+        y=sales_by_category['Sales Total'],
+        marker_color=[colorway[i % len(colorway)] for i in range(len(sales_by_category))]
+    ))
+    fig_bar.update_layout(
+        title='Sales Total by Product Category',
+        xaxis_title='Category',
+        yaxis_title='Sales Total',
+        template='seaborn'
+    )
+    fig_bar.update_traces(
+        text=sales_by_category['Sales Total'].round(0),
+        texttemplate='₹%{text:,.0f}',
+        textposition='outside'
+    )
+    return fig_bar.to_dict()
+
+@st.cache_data(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_top_items_fig(top_items_margin):
+    """Builds the Top 10 Items by Margin horizontal bar chart."""
+    fig_top_items = go.Figure(go.Bar(
+        x=top_items_margin['Margin'],
+        y=top_items_margin['Item'],
+        orientation='h',
+        marker=dict(
+            color=top_items_margin['Margin'],
+            colorscale='Plotly3',
+            showscale=True,
+            colorbar=dict(title='Margin')
+        )
+    ))
+    fig_top_items.update_layout(
+        title='Top 10 Items by Margin',
+        xaxis_title='Margin',
+        yaxis_title='Item',
+        yaxis={'categoryorder':'total ascending'},
+        template='seaborn'
+    )
+
+    fig_top_items.update_traces(
+        text=top_items_margin['Margin'].round(0),
+        texttemplate='₹%{text:,.0f}',
+        textposition='outside'
+    )
+    return fig_top_items.to_dict()
+
+@st.cache_data(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_regional_comparison_fig(regional_summary):
+    """Builds the grouped Sales Total vs. Margin by Region bar chart."""
+    # One grouped bar trace per metric (no need to melt the summary into long format)
+    fig_comparison = go.Figure([
+        go.Bar(
+            name=metric,
+            x=regional_summary['Region'],
+            y=regional_summary[metric],
+            text=regional_summary[metric].round(0),
+            texttemplate='₹%{text:,.0f}',
+            textposition='outside'
+        )
+        for metric in ('Sales Total', 'Margin')
+    ])
+    fig_comparison.update_layout(
+        barmode='group',
+        title='Sales Total vs. Margin by Region',
+        xaxis_title='Region',
+        yaxis_title='Amount',
+        legend_title='Metric',
+        template='seaborn'
+    )
+    return fig_comparison.to_dict()
+
+@st.cache_data(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_pie_fig(chart_data, names, values, title):
+    """Builds a donut chart of `values` per `names` for the clickable contribution pies."""
+    fig_pie = go.Figure(go.Pie(
+        values=chart_data[values],
+        labels=chart_data[names],
+        textinfo='label+percent',
+        hole=0.3
+    ))
+    fig_pie.update_layout(title=title, template='seaborn')
+    return fig_pie.to_dict()
+
 df = load_data(FILE_PATH, SHEET_NAME)
 
 # Check if DataFrame is empty due to an error
 if df.empty:
     st.stop() # Stop the script if data loading failed
 
+uniques = get_unique_values(df)
+
 # --- 2. Dashboard Layout and Title ---
 st.set_page_config(layout="wide")
 st.title("📊 Reuben's Excel Sales Data Dashboard (Interactive)")
@@ -82,6 +408,28 @@ st.sidebar.markdown("---")
 def reset_chart_filters():
     st.session_state.region_click_filter = []
     st.session_state.category_click_filter = []
+    # Remount the pie charts so they don't replay the click behind the filters just cleared
+    st.session_state.chart_click_nonce += 1
+
+# Applies a single-value chart filter from a pie slice click; clicking the filtered slice again clears it.
+# Returns True when the filter changed (the caller then reruns the script to apply it).
+def handle_pie_click(clicked_points, filter_key, names_key):
+    # Pie click events carry 'pointNumber' (never 'pointIndex'): the slice's row in the DataFrame used to
+    # generate the chart. Its names are stashed in session state as a plain NumPy array (O(1) lookup).
+    point_number = clicked_points[0].get('pointNumber') if clicked_points else None
+    names = st.session_state.get(names_key)
+    if point_number is None or names is None or not 0 <= point_number < len(names):
+        return False
+    clicked_name = names[point_number]
+
+    # Logic to apply/clear filter (only this chart's filter is touched)
+    if st.session_state[filter_key] == [clicked_name]:
+        st.session_state[filter_key] = []
+    else:
+        st.session_state[filter_key] = [clicked_name]
+    # The click has been consumed: remount the charts so it isn't returned again on the next rerun
+    st.session_state.chart_click_nonce += 1
+    return True
 
 # Button to clear chart filters
 st.sidebar.button("Clear Chart Filters", on_click=reset_chart_filters, help="Removes any filtering applied by clicking on the pie charts.")
@@ -90,14 +438,11 @@ st.sidebar.markdown("---")
 st.sidebar.info("Sidebar selections filter all data. Chart clicks below can be used to apply temporary, single-value filters.")
 
 
-# Initialize the filtered DataFrame to the full dataset
-df_filtered = df.copy()
-
 # --- NEW FILTER APPLICATION LOGIC (Explicit Priority) ---
 
 # 1. Handle Region Filter (Chart Click Priority)
 if 'Region' in df.columns:
-    region_options = df['Region'].unique()
+    region_options = uniques['Region']
     if st.session_state.region_click_filter:
         selected_regions = st.session_state.region_click_filter
         st.sidebar.markdown(f"**Region Filter (Chart Override):** `{selected_regions[0]}`")
@@ -107,14 +452,14 @@ if 'Region' in df.columns:
         selected_regions = st.sidebar.multiselect(
             'Select Region:',
             options=region_options,
-            default=region_options.tolist()
+            default=region_options
         )
 else:
     selected_regions = []
 
 # 2. Handle Category Filter (Chart Click Priority)
 if 'Category' in df.columns:
-    category_options = df['Category'].unique()
+    category_options = uniques['Category']
     if st.session_state.category_click_filter:
         selected_categories = st.session_state.category_click_filter
         st.sidebar.markdown(f"**Category Filter (Chart Override):** `{selected_categories[0]}`")
@@ -124,7 +469,7 @@ if 'Category' in df.columns:
         selected_categories = st.sidebar.multiselect(
             'Select Category:',
             options=category_options,
-            default=category_options.tolist()
+            default=category_options
         )
 else:
     selected_categories = []
@@ -133,8 +478,8 @@ else:
 if 'Supplier' in df.columns:
     selected_suppliers = st.sidebar.multiselect(
         'Select Supplier:',
-        options=df['Supplier'].unique(),
-        default=df['Supplier'].unique().tolist()
+        options=uniques['Supplier'],
+        default=uniques['Supplier']
     )
 else:
     selected_suppliers = []
@@ -142,8 +487,8 @@ else:
 if 'Item' in df.columns:
     selected_items = st.sidebar.multiselect(
         'Select Item:',
-        options=df['Item'].unique(),
-        default=df['Item'].unique().tolist()
+        options=uniques['Item'],
+        default=uniques['Item']
     )
 else:
     selected_items = []
@@ -151,24 +496,29 @@ else:
 if 'Month' in df.columns:
     selected_months = st.sidebar.multiselect(
         'Select Month:',
-        options=df['Month'].unique(),
-        default=df['Month'].unique().tolist()
+        options=uniques['Month'],
+        default=uniques['Month']
     )
 else:
     selected_months = []
 
 
-# 4. Apply all collected filters to the filtered DataFrame
-if selected_regions:
-    df_filtered = df_filtered[df_filtered['Region'].isin(selected_regions)]
-if selected_categories:
-    df_filtered = df_filtered[df_filtered['Category'].isin(selected_categories)]
-if selected_suppliers and 'Supplier' in df_filtered.columns:
-    df_filtered = df_filtered[df_filtered['Supplier'].isin(selected_suppliers)]
-if selected_items and 'Item' in df_filtered.columns:
-    df_filtered = df_filtered[df_filtered['Item'].isin(selected_items)]
-if selected_months and 'Month' in df_filtered.columns:
-    df_filtered = df_filtered[df_filtered['Month'].isin(selected_months)]
+# 4. Combine all collected filters into one boolean mask and slice the DataFrame only once
+filter_selections = {
+    'Region': selected_regions,
+    'Category': selected_categories,
+    'Supplier': selected_suppliers,
+    'Item': selected_items,
+    'Month': selected_months,
+}
+mask = None
+for column, selected in filter_selections.items():
+    # Selecting every value (the default) excludes nothing, so skip the O(N) membership test entirely
+    if selected and column in df.columns and len(selected) != len(uniques[column]):
+        column_mask = df[column].isin(set(selected)).to_numpy()
+        mask = column_mask if mask is None else mask & column_mask
+# Without an effective filter df_filtered is just the (cached, never mutated) full dataset: no copy is made
+df_filtered = df.loc[mask] if mask is not None else df
 
 # --- END NEW FILTER APPLICATION LOGIC ---
 
@@ -180,41 +530,59 @@ if df_filtered.empty and not df.empty:
 st.markdown("---")
 col1, col2, col3 = st.columns(3)
 
+# Sum each KPI column straight from its own (downcast) array, accumulating in float64;
+# nansum matches pandas' NaN-skipping sum and avoids building a mixed-dtype N x 3 matrix
+kpi_cols = [c for c in ('Sales Total', 'Margin', 'Sales Qty') if c in df_filtered.columns]
+kpi_sums = {c: np.nansum(df_filtered[c].to_numpy(), dtype=np.float64) for c in kpi_cols}
+
 if 'Sales Total' in df_filtered.columns:
-    total_sales = df_filtered['Sales Total'].sum()
+    total_sales = kpi_sums['Sales Total']
     col1.metric("Total Sales", f"₹{total_sales:,.2f}")
 
 if 'Margin' in df_filtered.columns:
-    total_margin = df_filtered['Margin'].sum()
+    total_margin = kpi_sums['Margin']
     col2.metric("Total Margin", f"₹{total_margin:,.2f}")
 
 if 'Sales Price' in df_filtered.columns and 'Sales Qty' in df_filtered.columns and 'Sales Total' in df_filtered.columns:
-    sales_qty_sum = df_filtered['Sales Qty'].sum()
-    avg_sales_price = (df_filtered['Sales Total'].sum() / sales_qty_sum) if sales_qty_sum > 0 else 0
+    sales_qty_sum = kpi_sums['Sales Qty']
+    avg_sales_price = (kpi_sums['Sales Total'] / sales_qty_sum) if sales_qty_sum > 0 else 0
     col3.metric("Avg. Sales Price", f"₹{avg_sales_price:.2f}")
 
 
+# Monthly sums of every measure the trend and revenue charts need, in a single call
+# (months come back in sorted category order, which is the charts' x-axis order)
+monthly_measures = [c for c in ('Sales Total', 'Net_Revenue') if c in df_filtered.columns]
+if 'Month' in df_filtered.columns and monthly_measures:
+    monthly_totals = sum_by_codes(df_filtered, 'Month', monthly_measures)
+
 # --- 5. Monthly Sales Trend (Time Series Chart) ---
 st.markdown("---")
 st.subheader("Time Series Trend")
 
 if 'Month' in df_filtered.columns and 'Sales Total' in df_filtered.columns:
-    sales_trend = df_filtered.groupby('Month')['Sales Total'].sum().reset_index()
-
-    fig_line = px.line(
-        sales_trend,
-        x='Month',
-        y='Sales Total',
-        title='Monthly Sales Total Trend',
-        markers=True,
-        template='seaborn'
-    )
-    fig_line.update_traces(
-        mode='lines+markers+text', 
-        text=sales_trend['Sales Total'].round(0), 
-        texttemplate='₹%{text:,.0f}',           
-        textposition='top center'
+    sales_trend = monthly_totals[['Month', 'Sales Total']]
+
+    # Optional level-of-detail aggregation: collapse consecutive months into at most LINE_MAX_POINTS buckets
+    trend_agg = st.sidebar.selectbox(
+        'Trend aggregation',
+        ['NONE', *TREND_AGGREGATORS],
+        help="How to combine points when the time series has more than "
+             f"{LINE_MAX_POINTS} months. NONE keeps a shape-preserving sample instead."
     )
+    if trend_agg != 'NONE' and len(sales_trend) > LINE_MAX_POINTS:
+        bucket = np.arange(len(sales_trend)) // math.ceil(len(sales_trend) / LINE_MAX_POINTS)
+        sales_trend = sales_trend.groupby(bucket).agg(
+            {'Month': 'first', 'Sales Total': TREND_AGGREGATORS[trend_agg]}
+        ).reset_index(drop=True)
+
+    # Keep the browser responsive if Month ever becomes high-cardinality (e.g. daily dates):
+    # M4 cheaply reduces very long series to the pixel resolution, then LTTB caps the point count
+    if len(sales_trend) > 4 * LINE_CANVAS_WIDTH:
+        sales_trend = sales_trend.iloc[m4_indices(sales_trend['Sales Total'].to_numpy(), LINE_CANVAS_WIDTH)]
+    if len(sales_trend) > LINE_MAX_POINTS:
+        sales_trend = sales_trend.iloc[lttb_indices(sales_trend['Sales Total'].to_numpy(), LINE_MAX_POINTS)]
+
+    fig_line = build_trend_fig(sales_trend)
     st.plotly_chart(fig_line, use_container_width=True)
 else:
     st.warning("Required columns ('Month', 'Sales Total') for Monthly Sales Trend are missing.")
@@ -233,21 +601,11 @@ if 'Month' in df_filtered.columns and ('Net_Revenue' in df_filtered.columns or '
     revenue_col = 'Net_Revenue' if 'Net_Revenue' in df_filtered.columns else 'Sales Total'
     
     # Group by month for the chart
-    revenue_data = df_filtered.groupby('Month')[revenue_col].sum().reset_index()
+    revenue_data = monthly_totals[['Month', revenue_col]]
 
     # 2. YOUR CHART CODE (The Figure Generation)
     # --------------------------------------------------------------------
-    my_new_chart_figure = px.bar(
-        revenue_data,
-        x='Month',
-        y=revenue_col,
-        title=f'{revenue_col} by Month',
-        # Optional: Customize look for professionalism
-        labels={revenue_col: 'Amount ($)'},
-        color_discrete_sequence=['#1f77b4'], # Sets a professional blue color
-        template='seaborn'
-    )
-    my_new_chart_figure.update_traces(textposition='outside')
+    my_new_chart_figure = build_revenue_fig(revenue_data, revenue_col)
     # --------------------------------------------------------------------
 
     # 3. THE INTEGRATION COMMAND
@@ -266,21 +624,9 @@ chart_col1, chart_col2 = st.columns(2)
 # Bar Chart 1: Sales Total by Category
 with chart_col1:
     if 'Category' in df_filtered.columns and 'Sales Total' in df_filtered.columns:
-        sales_by_category = df_filtered.groupby('Category')['Sales Total'].sum().reset_index()
-
-        fig_bar = px.bar(
-            sales_by_category,
-            x='Category',
-            y='Sales Total',
-            title='Sales Total by Product Category',
-            color='Category',
-            template='seaborn'
-        )
-        fig_bar.update_traces(
-            text=sales_by_category['Sales Total'].round(0), 
-            texttemplate='₹%{text:,.0f}', 
-            textposition='outside'
-        )
+        sales_by_category = sum_by_codes(df_filtered, 'Category', ['Sales Total'])
+
+        fig_bar = build_category_sales_fig(sales_by_category)
         st.plotly_chart(fig_bar, use_container_width=True)
     else:
         st.warning("Required columns ('Category', 'Sales Total') for Category Sales Bar Chart are missing.")
@@ -288,25 +634,10 @@ with chart_col1:
 # Bar Chart 2: Top 10 Items by Margin
 with chart_col2:
     if 'Item' in df_filtered.columns and 'Margin' in df_filtered.columns:
-        top_items_margin = df_filtered.groupby('Item')['Margin'].sum().nlargest(10).reset_index()
-        
-        fig_top_items = px.bar(
-            top_items_margin,
-            x='Margin',
-            y='Item',
-            title='Top 10 Items by Margin',
-            orientation='h', 
-            color='Margin',
-            color_continuous_scale=px.colors.sequential.Plotly3,
-            template='seaborn'
-        )
-        fig_top_items.update_layout(yaxis={'categoryorder':'total ascending'})
+        item_margin = sum_by_codes(df_filtered, 'Item', ['Margin'])
+        top_items_margin = item_margin.iloc[top_k_positions(item_margin['Margin'].to_numpy(), 10)]
         
-        fig_top_items.update_traces(
-            text=top_items_margin['Margin'].round(0), 
-            texttemplate='₹%{text:,.0f}', 
-            textposition='outside'
-        )
+        fig_top_items = build_top_items_fig(top_items_margin)
 
         st.plotly_chart(fig_top_items, use_container_width=True)
     else:
@@ -318,32 +649,9 @@ st.markdown("---")
 st.subheader("Regional Performance Comparison (Sales vs. Margin)")
 
 if 'Region' in df_filtered.columns and 'Sales Total' in df_filtered.columns and 'Margin' in df_filtered.columns:
-    regional_summary = df_filtered.groupby('Region').agg(
-        {'Sales Total': 'sum', 'Margin': 'sum'}
-    ).reset_index()
-    
-    regional_summary_melted = regional_summary.melt(
-        id_vars='Region',
-        value_vars=['Sales Total', 'Margin'],
-        var_name='Metric',
-        value_name='Amount'
-    )
-
-    fig_comparison = px.bar(
-        regional_summary_melted,
-        x='Region',
-        y='Amount',
-        color='Metric',
-        barmode='group', 
-        title='Sales Total vs. Margin by Region',
-        template='seaborn'
-    )
+    regional_summary = sum_by_codes(df_filtered, 'Region', ['Sales Total', 'Margin'])
     
-    fig_comparison.update_traces(
-        text=regional_summary_melted['Amount'].round(0),
-        texttemplate='₹%{text:,.0f}',
-        textposition='outside'
-    )
+    fig_comparison = build_regional_comparison_fig(regional_summary)
     
     st.plotly_chart(fig_comparison, use_container_width=True)
 else:
@@ -361,41 +669,24 @@ pie_col1, pie_col2 = st.columns(2)
 with pie_col1:
     if 'Region' in df_filtered.columns and 'Sales Total' in df_filtered.columns:
         # Use the original unfiltered data (df) here so the pie chart is static and always shows the full distribution.
-        region_sales = df.groupby('Region')['Sales Total'].sum().reset_index()
-
-        fig_pie_region_sales = px.pie(
-            region_sales,
-            values='Sales Total',
-            names='Region',
-            title='Region Wise Sales Percentage (Click to Filter)',
-            template='seaborn',
-            hole=0.3 
-        )
-        fig_pie_region_sales.update_traces(textinfo='label+percent')
+        region_sales = get_region_sales(df)
+        st.session_state['_region_names'] = region_sales['Region'].to_numpy()
+
+        # plotly_events needs a Figure object (it serializes the figure itself)
+        fig_pie_region_sales = go.Figure(build_pie_fig(
+            region_sales, 'Region', 'Sales Total', 'Region Wise Sales Percentage (Click to Filter)'
+        ))
         
         # CAPTURE CLICK EVENT
         selected_region = plotly_events(
             fig_pie_region_sales,
             override_height=fig_pie_region_sales.layout.height,
-            key="region_pie_click"
+            key=f"region_pie_click_{st.session_state.chart_click_nonce}"
         )
         
         # Update session state based on click
-        if selected_region:
-            # Use 'pointIndex' to reliably map back to the 'Region' name in the DataFrame
-            if selected_region[0] and 'pointIndex' in selected_region[0]:
-                point_index = selected_region[0]['pointIndex']
-                # Retrieve the actual region name from the DataFrame used to generate the chart
-                clicked_region_name = region_sales.iloc[point_index]['Region']
-                
-                # Logic to apply/clear filter
-                if not st.session_state.region_click_filter or st.session_state.region_click_filter[0] != clicked_region_name:
-                    st.session_state.region_click_filter = [clicked_region_name]
-                    st.rerun() # Rerun the script to apply filter
-                elif st.session_state.region_click_filter[0] == clicked_region_name:
-                     # Clear filter if the same slice is clicked again
-                     reset_chart_filters()
-                     st.rerun()
+        if handle_pie_click(selected_region, 'region_click_filter', '_region_names'):
+            st.rerun() # Rerun the script to apply filter
 
     else:
         st.warning("Required columns ('Region', 'Sales Total') for Region Sales Pie Chart are missing.")
@@ -404,41 +695,24 @@ with pie_col1:
 with pie_col2:
     if 'Category' in df_filtered.columns and 'Margin' in df_filtered.columns:
         # Use the original unfiltered data (df) here so the pie chart is static and always shows the full distribution.
-        category_margin = df.groupby('Category')['Margin'].sum().reset_index()
-
-        fig_pie_category_margin = px.pie(
-            category_margin,
-            values='Margin',
-            names='Category',
-            title='Category Wise Margin Distribution (Click to Filter)',
-            template='seaborn',
-            hole=0.3
-        )
-        fig_pie_category_margin.update_traces(textinfo='label+percent')
+        category_margin = get_category_margin(df)
+        st.session_state['_category_names'] = category_margin['Category'].to_numpy()
+
+        # plotly_events needs a Figure object (it serializes the figure itself)
+        fig_pie_category_margin = go.Figure(build_pie_fig(
+            category_margin, 'Category', 'Margin', 'Category Wise Margin Distribution (Click to Filter)'
+        ))
         
         # CAPTURE CLICK EVENT
         selected_category = plotly_events(
             fig_pie_category_margin,
             override_height=fig_pie_category_margin.layout.height,
-            key="category_pie_click"
+            key=f"category_pie_click_{st.session_state.chart_click_nonce}"
         )
         
         # Update session state based on click
-        if selected_category:
-            # Use 'pointIndex' to reliably map back to the 'Category' name in the DataFrame
-            if selected_category[0] and 'pointIndex' in selected_category[0]:
-                point_index = selected_category[0]['pointIndex']
-                # Retrieve the actual category name from the DataFrame used to generate the chart
-                clicked_category_name = category_margin.iloc[point_index]['Category']
-
-                # Logic to apply/clear filter
-                if not st.session_state.category_click_filter or st.session_state.category_click_filter[0] != clicked_category_name:
-                    st.session_state.category_click_filter = [clicked_category_name]
-                    st.rerun() # Rerun the script to apply filter
-                elif st.session_state.category_click_filter[0] == clicked_category_name:
-                     # Clear filter if the same slice is clicked again
-                     reset_chart_filters()
-                     st.rerun()
+        if handle_pie_click(selected_category, 'category_click_filter', '_category_names'):
+            st.rerun() # Rerun the script to apply filter
 
     else:
         st.warning("Required columns ('Category', 'Margin') for Category Margin Pie Chart are missing.")
@@ -449,11 +723,16 @@ with pie_col2:
 # --- 9. Data Table Preview ---
 st.markdown("---")
 st.subheader("Raw Data Preview")
-st.dataframe(df_filtered)
+# Only one page of rows is serialized to the browser, however large the filtered data is
+page_count = max(1, math.ceil(len(df_filtered) / PREVIEW_PAGE_SIZE))
+page = st.number_input('Page', min_value=1, max_value=page_count, value=1, step=1, help=f"{PREVIEW_PAGE_SIZE} rows per page")
+start = (page - 1) * PREVIEW_PAGE_SIZE
+st.caption(f"Rows {start + 1:,}–{min(start + PREVIEW_PAGE_SIZE, len(df_filtered)):,} of {len(df_filtered):,}")
+st.dataframe(df_filtered.iloc[start:start + PREVIEW_PAGE_SIZE])
 
 # --- How to Run This Script ---
 # 1. Ensure you have all libraries installed:
-#    pip install streamlit pandas plotly openpyxl streamlit-plotly-events
+#    pip install streamlit pandas plotly python-calamine pyarrow streamlit-plotly-events
 # 2. Save this code as 'dashboard_app.py'.
 # 3. Ensure your Excel file 'sales_data.xlsx' is in the same folder.
 # 4. Run the application from your command prompt: